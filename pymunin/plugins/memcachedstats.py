@@ -50,15 +50,21 @@ Environment Variables for Multiple Instances of Plugin (Omitted by default.)
     [memcachedstats]
         env.exclude_graphs memcached_connrate
 
+Asynchronous Polling
+
+  No plugin specific setup is needed for running the plugin through
+  munin-async; munin-asyncd executes the plugin on the node and spools the
+  values, which are collected by the Munin master using spoolfetch.
+
 """
 # Munin  - Magic Markers
 #%# family=auto
 #%# capabilities=autoconf nosuggest
 
 import sys
+import atexit
 from pymunin import MuninGraph, MuninPlugin, muninMain
 from pysysinfo.memcached import MemcachedInfo
-from pysysinfo.util import safe_sum
 
 __author__ = "Ali Onur Uyar"
 __copyright__ = "Copyright 2011, Ali Onur Uyar"
@@ -70,6 +76,223 @@ __email__ = "aouyar at gmail.com"
 __status__ = "Development"
 
 
+graphSpecs = (
+    ('memcached_connections', ('curr_connections',),
+     dict(title='Memcached - Active Connections',
+          info='Active connections for Memcached Server.',
+          vlabel='connections', args='--base 1000 --lower-limit 0'),
+     (('conn', 'conn', None, dict(draw='LINE2', type='GAUGE')),)),
+    ('memcached_items', ('curr_items',),
+     dict(title='Memcached - Items',
+          info='Current number of items stored on Memcached Server.',
+          vlabel='items', args='--base 1000 --lower-limit 0'),
+     (('items', 'items', None, dict(draw='LINE2', type='GAUGE')),)),
+    ('memcached_memory', ('bytes',),
+     dict(title='Memcached - Memory Usage',
+          info='Memory used to store items on Memcached Server in bytes.',
+          vlabel='bytes', args='--base 1024 --lower-limit 0'),
+     (('bytes', 'bytes', None, dict(draw='LINE2', type='GAUGE')),)),
+    ('memcached_connrate', ('total_connections',),
+     dict(title='Memcached - Throughput - Connections',
+          info='Connections per second.',
+          vlabel='conn / sec', args='--base 1000 --lower-limit 0'),
+     (('conn', 'conn', None, dict(draw='LINE2', type='DERIVE', min=0)),)),
+    ('memcached_traffic', ('bytes_read', 'bytes_written'),
+     dict(title='Memcached - Throughput - Network',
+          info='Bytes sent (+) / received (-)  by Memcached per second.',
+          vlabel='bytes in (-) / out (+) per second',
+          args='--base 1024 --lower-limit 0'),
+     (('rxbytes', 'bytes', None, 
+       dict(draw='LINE2', type='DERIVE', min=0, graph=False)),
+      ('txbytes', 'bytes', None, 
+       dict(draw='LINE2', type='DERIVE', min=0, negative='rxbytes')))),
+    ('memcached_reqrate', ('cmd_set', 'cmd_get'),
+     dict(title='Memcached - Throughput - Request Rate',
+          info='Requests per second.',
+          vlabel='reqs / sec', args='--base 1000 --lower-limit 0'),
+     tuple((fname, fname, fstat, 
+            dict(draw='AREASTACK', type='DERIVE', min=0, 
+                 info='%s requests per second.' % fstr))
+           for (fname, fstat, fstr) in (('set', 'cmd_set', 'Set'),
+                                        ('get', 'cmd_get', 'Get'),
+                                        ('del', 'delete_hits', 'Delete'),
+                                        ('cas', 'cas_hits', 'CAS'),
+                                        ('incr', 'incr_hits', 'Increment'),
+                                        ('decr', 'decr_hits', 'Decrement')))),
+    ('memcached_statget', ('cmd_get',),
+     dict(title='Memcached - Stats - Get',
+          info='Get requests per second.',
+          vlabel='reqs / sec', args='--base 1000 --lower-limit 0'),
+     (('hit', 'hit', None, dict(draw='AREASTACK', type='DERIVE', min=0, 
+                                info='Get request hits per second.')),
+      ('miss', 'miss', None, dict(draw='AREASTACK', type='DERIVE', min=0, 
+                                  info='Get request misses per second.')),
+      ('total', 'total', None, dict(draw='LINE1', type='DERIVE', min=0,
+                                    colour='000000', 
+                                    info='Total get requests per second.')))),
+    ('memcached_statset', ('cmd_set',),
+     dict(title='Memcached - Stats - Set',
+          info='Set requests per second.',
+          vlabel='reqs / sec', args='--base 1000 --lower-limit 0'),
+     (('hit', 'hit', None, dict(draw='AREASTACK', type='DERIVE', min=0, 
+                                info='Set request hits per second.')),
+      ('miss', 'miss', None, dict(draw='AREASTACK', type='DERIVE', min=0, 
+                                  info='Set request misses per second.')),
+      ('total', 'total', None, dict(draw='LINE1', type='DERIVE', min=0,
+                                    colour='000000', 
+                                    info='Total set requests per second.')))),
+    ('memcached_statdel', ('delete_hits',),
+     dict(title='Memcached - Stats - Delete',
+          info='Delete requests per second.',
+          vlabel='reqs / sec', args='--base 1000 --lower-limit 0'),
+     (('hit', 'hit', None, dict(draw='AREASTACK', type='DERIVE', min=0, 
+                                info='Delete request hits per second.')),
+      ('miss', 'miss', None, dict(draw='AREASTACK', type='DERIVE', min=0, 
+                                  info='Delete request misses per second.')),
+      ('total', 'total', None, dict(draw='LINE1', type='DERIVE', min=0,
+                                    colour='000000', 
+                                    info='Total delete requests per second.')))),
+    ('memcached_statcas', ('cas_hits',),
+     dict(title='Memcached - Stats - CAS',
+          info='CAS requests per second.',
+          vlabel='reqs / sec', args='--base 1000 --lower-limit 0'),
+     (('hit', 'hit', None, dict(draw='AREASTACK', type='DERIVE', min=0, 
+                                info='CAS request hits per second.')),
+      ('miss', 'miss', None, dict(draw='AREASTACK', type='DERIVE', min=0, 
+                                  info='CAS request misses per second.')),
+      ('badval', 'badval', None, 
+       dict(draw='AREASTACK', type='DERIVE', min=0, 
+            info='CAS requests hits with bad value per second.')),
+      ('total', 'total', None, dict(draw='LINE1', type='DERIVE', min=0,
+                                    colour='000000', 
+                                    info='Total CAS requests per second.')))),
+    ('memcached_statincrdecr', ('incr_hits', 'decr_hits'),
+     dict(title='Memcached - Stats - Incr / Decr',
+          info='Increment / decrement requests per second.',
+          vlabel='reqs / sec', args='--base 1000 --lower-limit 0'),
+     (('incr_hit', 'incr_hit', None, 
+       dict(draw='AREASTACK', type='DERIVE', min=0, 
+            info='Increment hits per second.')),
+      ('decr_hit', 'decr_hit', None, 
+       dict(draw='AREASTACK', type='DERIVE', min=0, 
+            info='Decrement hits per second.')),
+      ('incr_miss', 'incr_miss', None, 
+       dict(draw='AREASTACK', type='DERIVE', min=0, 
+            info='Increment misses per second.')),
+      ('decr_miss', 'decr_miss', None, 
+       dict(draw='AREASTACK', type='DERIVE', min=0, 
+            info='Decrement misses per second.')),
+      ('total', 'total', None, 
+       dict(draw='LINE1', type='DERIVE', min=0, colour='000000', 
+            info='Total Increment / decrement requests per second.')))),
+    ('memcached_statevict', ('evictions',),
+     dict(title='Memcached - Stats - Evictions',
+          info='Cache evictions and reclaims per second.',
+          vlabel='per second', args='--base 1000 --lower-limit 0'),
+     (('evict', 'evict', None, 
+       dict(draw='LINE2', type='DERIVE', min=0, 
+            info='Items evicted from cache per second.')),
+      ('reclaim', 'reclaim', 'reclaimed', 
+       dict(draw='LINE2', type='DERIVE', min=0, 
+            info='Items stored over expired entries per second.')))),
+    ('memcached_statauth', ('auth_cmds',),
+     dict(title='Memcached - Stats - Authentication',
+          info='Autentication requests per second.',
+          vlabel='reqs / sec', args='--base 1000 --lower-limit 0'),
+     (('reqs', 'reqs', None, 
+       dict(draw='LINE2', type='DERIVE', min=0, 
+            info='Authentication requests per second.')),
+      ('errors', 'errors', None, 
+       dict(draw='LINE2', type='DERIVE', min=0, 
+            info='Authentication errors per second.')))),
+    ('memcached_hitpct', ('cmd_set', 'cmd_get'),
+     dict(title='Memcached - Hit Percent',
+          info='Hit percent for memcached requests.',
+          vlabel='%', args='--base 1000 --lower-limit 0'),
+     (('set', 'set', None, dict(draw='LINE2', type='GAUGE', 
+                                info='Stored items vs. total set requests.')),)
+     + tuple((fname, fname, fstat, 
+              dict(draw='LINE2', type='GAUGE', 
+                   info='%s requests - hits vs total.' % fstr))
+             for (fname, fstat, fstr) in (('get', 'cmd_get', 'Get'),
+                                          ('del', 'delete_hits', 'Delete'),
+                                          ('cas', 'cas_hits', 'CAS'),
+                                          ('incr', 'incr_hits', 'Increment'),
+                                          ('decr', 'decr_hits', 'Decrement')))),
+)
+"""Graph definitions: (graph name, stats required for graph, graph attributes,
+field definitions). Field definitions are (field name, label, stat required 
+for field or None, field attributes)."""
+
+fetchSpecs = {
+    'memcached_connections': (('conn', ('curr_connections',)),),
+    'memcached_items': (('items', ('curr_items',)),),
+    'memcached_memory': (('bytes', ('bytes',)),),
+    'memcached_connrate': (('conn', ('total_connections',)),),
+    'memcached_traffic': (('rxbytes', ('bytes_read',)),
+                          ('txbytes', ('bytes_written',))),
+    'memcached_reqrate': (('set', ('cmd_set',)),
+                          ('get', ('cmd_get',)),
+                          ('del', ('delete_hits', 'delete_misses')),
+                          ('cas', ('cas_hits', 'cas_misses', 'cas_badval')),
+                          ('incr', ('incr_hits', 'incr_misses')),
+                          ('decr', ('decr_hits', 'decr_misses'))),
+    'memcached_statget': (('hit', ('get_hits',)),
+                          ('miss', ('get_misses',)),
+                          ('total', ('get_hits', 'get_misses'))),
+    'memcached_statset': (('hit', ('set_hits',)),
+                          ('miss', ('set_misses',)),
+                          ('total', ('set_hits', 'set_misses'))),
+    'memcached_statdel': (('hit', ('delete_hits',)),
+                          ('miss', ('delete_misses',)),
+                          ('total', ('delete_hits', 'delete_misses'))),
+    'memcached_statcas': (('hit', ('cas_hits',)),
+                          ('miss', ('cas_misses',)),
+                          ('badval', ('cas_badval',)),
+                          ('total', ('cas_hits', 'cas_misses', 
+                                     'cas_badval'))),
+    'memcached_statincrdecr': (('incr_hit', ('incr_hits',)),
+                               ('decr_hit', ('decr_hits',)),
+                               ('incr_miss', ('incr_misses',)),
+                               ('decr_miss', ('decr_misses',)),
+                               ('total', ('incr_hits', 'decr_hits',
+                                          'incr_misses', 'decr_misses'))),
+    'memcached_statevict': (('evict', ('evictions',)),
+                            ('reclaim', ('reclaimed',))),
+    'memcached_statauth': (('reqs', ('auth_cmds',)),
+                           ('errors', ('auth_errors',))),
+}
+"""Value definitions: graph name -> ((field name, stats summed for field), ...).
+Values for memcached_hitpct are calculated separately from previous state."""
+
+hitpctFields = (
+    ('set', 'set_hits', 'set_misses'),
+    ('get', 'get_hits', 'get_misses'),
+    ('del', 'delete_hits', 'delete_misses'),
+    ('cas', 'cas_hits', 'cas_misses'),
+    ('incr', 'incr_hits', 'incr_misses'),
+    ('decr', 'decr_hits', 'decr_misses'),
+)
+"""Hit percent definitions: (field name, hits stat, misses stat)."""
+
+
+def _getStateKeys():
+    """Return the stats referenced by graphSpecs and hitpctFields."""
+    keys = set()
+    for (graph_name, graph_stats, graph_attrs, fields) in graphSpecs: #@UnusedVariable
+        keys.update(graph_stats)
+        keys.update([fstat for (fname, flabel, fstat, field_attrs) in fields #@UnusedVariable
+                     if fstat is not None])
+    for (field_name, field_hits, field_misses) in hitpctFields: #@UnusedVariable
+        keys.update((field_hits, field_misses))
+    return tuple(sorted(keys))
+
+
+stateKeys = _getStateKeys()
+"""Stats saved as plugin state; needed for graph configuration when stats are 
+restored from state and for calculating hit percents."""
+
+
 class MuninMemcachedPlugin(MuninPlugin):
     """Multigraph Munin Plugin for monitoring Memcached Server.
 
@@ -77,6 +300,9 @@ class MuninMemcachedPlugin(MuninPlugin):
     plugin_name = 'memcachedstats'
     isMultigraph = True
     isMultiInstance = True
+    
+    _serverCache = {}
+    """Connected MemcachedInfo instances keyed by (host, port, socket_file)."""
 
     def __init__(self, argv=(), env=None, debug=False):
         """Populate Munin Plugin with MuninGraph instances.
@@ -96,357 +322,116 @@ class MuninMemcachedPlugin(MuninPlugin):
         self._stats = None
         self._prev_stats = self.restoreState()
         if self._prev_stats is None:
-            serverInfo = MemcachedInfo(self._host,  self._port, 
-                                       self._socket_file)
-            self._stats = serverInfo.getStats()
-            stats = self._stats
+            stats = self._getStats()
         else:
             stats = self._prev_stats
         if stats is None:
             raise Exception("Undetermined error accesing stats.")
         
-        if (self.graphEnabled('memcached_connections')  
-            and stats.has_key('curr_connections')):
-            graph = MuninGraph('Memcached - Active Connections', self._category,
-                info='Active connections for Memcached Server.',
-                vlabel='connections', args='--base 1000 --lower-limit 0')
-            graph.addField('conn', 'conn', draw='LINE2', type='GAUGE')
-            self.appendGraph('memcached_connections', graph)
-        
-        if (self.graphEnabled('memcached_items')
-            and stats.has_key('curr_items')):
-            graph = MuninGraph('Memcached - Items', self._category,
-                info='Current number of items stored on Memcached Server.',
-                vlabel='items', args='--base 1000 --lower-limit 0')
-            graph.addField('items', 'items', draw='LINE2', type='GAUGE')
-            self.appendGraph('memcached_items', graph)
-        
-        if (self.graphEnabled('memcached_memory')
-            and stats.has_key('bytes')):
-            graph = MuninGraph('Memcached - Memory Usage', self._category,
-                info='Memory used to store items on Memcached Server in bytes.',
-                vlabel='bytes',
-                args='--base 1024 --lower-limit 0')
-            graph.addField('bytes', 'bytes', draw='LINE2', type='GAUGE')
-            self.appendGraph('memcached_memory', graph)
-        
-        if (self.graphEnabled('memcached_connrate')
-            and stats.has_key('total_connections')):
-            graph = MuninGraph('Memcached - Throughput - Connections', 
-                self._category,
-                info='Connections per second.',
-                vlabel='conn / sec',
-                args='--base 1000 --lower-limit 0')
-            graph.addField('conn', 'conn', draw='LINE2', type='DERIVE', min=0)
-            self.appendGraph('memcached_connrate', graph)
-        
-        if (self.graphEnabled('memcached_traffic')
-            and stats.has_key('bytes_read') and stats.has_key('bytes_written')):
-            graph = MuninGraph('Memcached - Throughput - Network', self._category,
-                info='Bytes sent (+) / received (-)  by Memcached per second.',
-                vlabel='bytes in (-) / out (+) per second',
-                args='--base 1024 --lower-limit 0')
-            graph.addField('rxbytes', 'bytes', draw='LINE2', type='DERIVE', 
-                           min=0, graph=False)
-            graph.addField('txbytes', 'bytes', draw='LINE2', type='DERIVE', 
-                           min=0, negative='rxbytes')
-            self.appendGraph('memcached_traffic', graph)
-            
-        if (self.graphEnabled('memcached_reqrate')
-            and stats.has_key('cmd_set')
-            and stats.has_key('cmd_get')):
-            graph = MuninGraph('Memcached - Throughput - Request Rate', 
-                self._category,
-                info='Requests per second.',
-                vlabel='reqs / sec', args='--base 1000 --lower-limit 0')
-            for (fname,fstat,fstr) in (('set', 'cmd_set', 'Set'),
-                                       ('get', 'cmd_get', 'Get'),
-                                       ('del', 'delete_hits', 'Delete'),
-                                       ('cas', 'cas_hits', 'CAS'),
-                                       ('incr', 'incr_hits', 'Increment'),
-                                       ('decr', 'decr_hits', 'Decrement')):
-                if stats.has_key(fstat):
-                    graph.addField(fname, fname, draw='AREASTACK', type='DERIVE', 
-                                   min=0, 
-                                   info='%s requests per second.' % fstr)
-            self.appendGraph('memcached_reqrate', graph)
-            
-        if (self.graphEnabled('memcached_statget')
-            and stats.has_key('cmd_get')):
-            graph = MuninGraph('Memcached - Stats - Get', 
-                self._category,
-                info='Get requests per second.',
-                vlabel='reqs / sec', args='--base 1000 --lower-limit 0')
-            graph.addField('hit', 'hit', draw='AREASTACK', type='DERIVE', min=0, 
-                info='Get request hits per second.')
-            graph.addField('miss', 'miss', draw='AREASTACK', type='DERIVE', min=0, 
-                info='Get request misses per second.')
-            graph.addField('total', 'total', draw='LINE1', type='DERIVE', min=0,
-                colour='000000', 
-                info='Total get requests per second.')
-            self.appendGraph('memcached_statget', graph)
-            
-        if (self.graphEnabled('memcached_statset')
-            and stats.has_key('cmd_set')):
-            graph = MuninGraph('Memcached - Stats - Set', 
-                self._category,
-                info='Set requests per second.', 
-                vlabel='reqs / sec', args='--base 1000 --lower-limit 0')
-            graph.addField('hit', 'hit', draw='AREASTACK', type='DERIVE', min=0, 
-                info='Set request hits per second.')
-            graph.addField('miss', 'miss', draw='AREASTACK', type='DERIVE', min=0, 
-                info='Set request misses per second.')
-            graph.addField('total', 'total', draw='LINE1', type='DERIVE', min=0,
-                colour='000000', 
-                info='Total set requests per second.')
-            self.appendGraph('memcached_statset', graph)
-            
-        if (self.graphEnabled('memcached_statdel')
-            and stats.has_key('delete_hits')):
-            graph = MuninGraph('Memcached - Stats - Delete', 
-                self._category,
-                info='Delete requests per second.',
-                vlabel='reqs / sec', args='--base 1000 --lower-limit 0')
-            graph.addField('hit', 'hit', draw='AREASTACK', type='DERIVE', min=0, 
-                info='Delete request hits per second.')
-            graph.addField('miss', 'miss', draw='AREASTACK', type='DERIVE', min=0, 
-                info='Delete request misses per second.')
-            graph.addField('total', 'total', draw='LINE1', type='DERIVE', min=0,
-                colour='000000', 
-                info='Total delete requests per second.')
-            self.appendGraph('memcached_statdel', graph)
-        
-        if (self.graphEnabled('memcached_statcas')
-            and stats.has_key('cas_hits')):
-            graph = MuninGraph('Memcached - Stats - CAS', 
-                self._category,
-                info='CAS requests per second.',
-                vlabel='reqs / sec', args='--base 1000 --lower-limit 0')
-            graph.addField('hit', 'hit', draw='AREASTACK', type='DERIVE', min=0, 
-                info='CAS request hits per second.')
-            graph.addField('miss', 'miss', draw='AREASTACK', type='DERIVE', min=0, 
-                info='CAS request misses per second.')
-            graph.addField('badval', 'badval', draw='AREASTACK', 
-                type='DERIVE', min=0, 
-                info='CAS requests hits with bad value per second.')
-            graph.addField('total', 'total', draw='LINE1', type='DERIVE', min=0,
-                colour='000000', 
-                info='Total CAS requests per second.')
-            self.appendGraph('memcached_statcas', graph)
-            
-        if (self.graphEnabled('memcached_statincrdecr')
-            and stats.has_key('incr_hits')
-            and stats.has_key('decr_hits')):
-            graph = MuninGraph('Memcached - Stats - Incr / Decr', 
-                self._category,
-                info='Increment / decrement requests per second.',
-                vlabel='reqs / sec', args='--base 1000 --lower-limit 0')
-            graph.addField('incr_hit', 'incr_hit', draw='AREASTACK', 
-                type='DERIVE', min=0, 
-                info='Increment hits per second.')
-            graph.addField('decr_hit', 'decr_hit', draw='AREASTACK', 
-                type='DERIVE', min=0, 
-                info='Decrement hits per second.')
-            graph.addField('incr_miss', 'incr_miss', draw='AREASTACK', 
-                type='DERIVE', min=0, 
-                info='Increment misses per second.')
-            graph.addField('decr_miss', 'decr_miss', draw='AREASTACK', 
-                type='DERIVE', min=0, 
-                info='Decrement misses per second.')
-            graph.addField('total', 'total', draw='LINE1', type='DERIVE', min=0,
-                colour='000000', 
-                info='Total Increment / decrement requests per second.')
-            self.appendGraph('memcached_statincrdecr', graph)
-            
-        if (self.graphEnabled('memcached_statevict')
-            and stats.has_key('evictions')):
-            graph = MuninGraph('Memcached - Stats - Evictions', 
-                self._category,
-                info='Cache evictions and reclaims per second.',
-                vlabel='per second', args='--base 1000 --lower-limit 0')
-            graph.addField('evict', 'evict', draw='LINE2', type='DERIVE', min=0, 
-                info='Items evicted from cache per second.')
-            if stats.has_key('reclaimed'):
-                graph.addField('reclaim', 'reclaim', draw='LINE2', type='DERIVE', 
-                    min=0, 
-                    info='Items stored over expired entries per second.')
-            self.appendGraph('memcached_statevict', graph)
-            
-        if (self.graphEnabled('memcached_statauth')
-            and stats.has_key('auth_cmds')):
-            graph = MuninGraph('Memcached - Stats - Authentication', 
-                self._category,
-                info='Autentication requests per second.',
-                vlabel='reqs / sec', args='--base 1000 --lower-limit 0')
-            graph.addField('reqs', 'reqs', draw='LINE2', type='DERIVE', min=0, 
-                info='Authentication requests per second.')
-            graph.addField('errors', 'errors', draw='LINE2', type='DERIVE', min=0, 
-                info='Authentication errors per second.')
-            self.appendGraph('memcached_statauth', graph)
-        
-        if (self.graphEnabled('memcached_hitpct')
-            and stats.has_key('cmd_set')
-            and stats.has_key('cmd_get')):
-            graph = MuninGraph('Memcached - Hit Percent', self._category,
-                info='Hit percent for memcached requests.',
-                vlabel='%', args='--base 1000 --lower-limit 0')
-            graph.addField('set', 'set', draw='LINE2', type='GAUGE', 
-                info='Stored items vs. total set requests.')
-            for (fname,fstat,fstr) in (('get', 'cmd_get', 'Get'),
-                                       ('del', 'delete_hits', 'Delete'),
-                                       ('cas', 'cas_hits', 'CAS'),
-                                       ('incr', 'incr_hits', 'Increment'),
-                                       ('decr', 'decr_hits', 'Decrement')):
-                if stats.has_key(fstat):
-                    graph.addField(fname, fname, draw='LINE2', type='GAUGE', 
-                                   info='%s requests - hits vs total.' % fstr)
-            self.appendGraph('memcached_hitpct', graph)
+        for (graph_name, graph_stats, graph_attrs, fields) in graphSpecs:
+            if (self.graphEnabled(graph_name)
+                and all(k in stats for k in graph_stats)):
+                graph = MuninGraph(category=self._category, **graph_attrs)
+                for (fname, flabel, fstat, field_attrs) in fields:
+                    if fstat is None or fstat in stats:
+                        graph.addField(fname, flabel, **field_attrs)
+                self.appendGraph(graph_name, graph)
             
     def retrieveVals(self):
         """Retrieve values for graphs."""
-        if self._stats is None:
-            serverInfo = MemcachedInfo(self._host,  self._port, self._socket_file)
-            stats = serverInfo.getStats()
-        else:
-            stats = self._stats
+        stats = self._getStats()
         if stats is None:
             raise Exception("Undetermined error accesing stats.")        
         stats['set_hits'] = stats.get('total_items')
-        if stats.has_key('cmd_set') and stats.has_key('total_items'): 
+        if 'cmd_set' in stats and 'total_items' in stats: 
             stats['set_misses'] = stats['cmd_set'] - stats['total_items']
-        self.saveState(stats)
-        if self.hasGraph('memcached_connections'):
-            self.setGraphVal('memcached_connections', 'conn', 
-                             stats.get('curr_connections'))
-        if self.hasGraph('memcached_items'):
-            self.setGraphVal('memcached_items', 'items', 
-                             stats.get('curr_items'))
-        if self.hasGraph('memcached_memory'):
-            self.setGraphVal('memcached_memory', 'bytes', 
-                             stats.get('bytes'))
-        if self.hasGraph('memcached_connrate'):
-            self.setGraphVal('memcached_connrate', 'conn', 
-                             stats.get('total_connections'))
-        if self.hasGraph('memcached_traffic'):
-            self.setGraphVal('memcached_traffic', 'rxbytes', 
-                             stats.get('bytes_read'))
-            self.setGraphVal('memcached_traffic', 'txbytes', 
-                             stats.get('bytes_written'))
-        if self.hasGraph('memcached_reqrate'):
-            self.setGraphVal('memcached_reqrate', 'set', 
-                             stats.get('cmd_set'))
-            self.setGraphVal('memcached_reqrate', 'get', 
-                             stats.get('cmd_get'))
-            if self.graphHasField('memcached_reqrate', 'del'):
-                self.setGraphVal('memcached_reqrate', 'del',
-                                 safe_sum([stats.get('delete_hits'), 
-                                           stats.get('delete_misses')]))
-            if self.graphHasField('memcached_reqrate', 'cas'):
-                self.setGraphVal('memcached_reqrate', 'cas',
-                                 safe_sum([stats.get('cas_hits'), 
-                                           stats.get('cas_misses'), 
-                                           stats.get('cas_badval')]))
-            if self.graphHasField('memcached_reqrate', 'incr'):
-                self.setGraphVal('memcached_reqrate', 'incr',
-                                 safe_sum([stats.get('incr_hits'), 
-                                           stats.get('incr_misses')]))
-            if self.graphHasField('memcached_reqrate', 'decr'):
-                self.setGraphVal('memcached_reqrate', 'decr',
-                                 safe_sum([stats.get('decr_hits'), 
-                                           stats.get('decr_misses')]))
-        if self.hasGraph('memcached_statget'):
-            self.setGraphVal('memcached_statget', 'hit', 
-                             stats.get('get_hits'))
-            self.setGraphVal('memcached_statget', 'miss', 
-                             stats.get('get_misses'))
-            self.setGraphVal('memcached_statget', 'total', 
-                             safe_sum([stats.get('get_hits'),
-                                       stats.get('get_misses')]))
-        if self.hasGraph('memcached_statset'):
-            self.setGraphVal('memcached_statset', 'hit', 
-                             stats.get('set_hits'))
-            self.setGraphVal('memcached_statset', 'miss', 
-                             stats.get('set_misses'))
-            self.setGraphVal('memcached_statset', 'total', 
-                             safe_sum([stats.get('set_hits'),
-                                       stats.get('set_misses')]))
-        if self.hasGraph('memcached_statdel'):
-            self.setGraphVal('memcached_statdel', 'hit', 
-                             stats.get('delete_hits'))
-            self.setGraphVal('memcached_statdel', 'miss', 
-                             stats.get('delete_misses'))
-            self.setGraphVal('memcached_statdel', 'total', 
-                             safe_sum([stats.get('delete_hits'),
-                                       stats.get('delete_misses')]))
-        if self.hasGraph('memcached_statcas'):
-            self.setGraphVal('memcached_statcas', 'hit', 
-                             stats.get('cas_hits'))
-            self.setGraphVal('memcached_statcas', 'miss', 
-                             stats.get('cas_misses'))
-            self.setGraphVal('memcached_statcas', 'badval', 
-                             stats.get('cas_badval'))
-            self.setGraphVal('memcached_statcas', 'total', 
-                             safe_sum([stats.get('cas_hits'),
-                                       stats.get('cas_misses'),
-                                       stats.get('cas_badval')]))
-        if self.hasGraph('memcached_statincrdecr'):
-            self.setGraphVal('memcached_statincrdecr', 'incr_hit', 
-                             stats.get('incr_hits'))
-            self.setGraphVal('memcached_statincrdecr', 'decr_hit', 
-                             stats.get('decr_hits'))
-            self.setGraphVal('memcached_statincrdecr', 'incr_miss', 
-                             stats.get('incr_misses'))
-            self.setGraphVal('memcached_statincrdecr', 'decr_miss', 
-                             stats.get('decr_misses'))
-            self.setGraphVal('memcached_statincrdecr', 'total', 
-                             safe_sum([stats.get('incr_hits'),
-                                       stats.get('decr_hits'),
-                                       stats.get('incr_misses'),
-                                       stats.get('decr_misses')]))
-        if self.hasGraph('memcached_statevict'):
-            self.setGraphVal('memcached_statevict', 'evict', 
-                             stats.get('evictions'))
-            if self.graphHasField('memcached_statevict', 'reclaim'):
-                self.setGraphVal('memcached_statevict', 'reclaim', 
-                                 stats.get('reclaimed'))
-        if self.hasGraph('memcached_statauth'):
-            self.setGraphVal('memcached_statauth', 'reqs', 
-                             stats.get('auth_cmds'))
-            self.setGraphVal('memcached_statauth', 'errors', 
-                             stats.get('auth_errors'))
-        if self.hasGraph('memcached_hitpct'):
-            prev_stats = self._prev_stats
-            for (field_name,  field_hits,  field_misses) in (
-                    ('set',  'set_hits',  'set_misses'),
-                    ('get',  'get_hits',  'get_misses'), 
-                    ('del',  'delete_hits',  'delete_misses'), 
-                    ('cas',  'cas_hits',  'cas_misses'), 
-                    ('incr',  'incr_hits',  'incr_misses'), 
-                    ('decr',  'decr_hits',  'decr_misses')
-                ):
-                if prev_stats:
-                    if (stats.has_key(field_hits) 
-                        and prev_stats.has_key(field_hits)
-                        and stats.has_key(field_misses) 
-                        and prev_stats.has_key(field_misses)):
-                        hits = stats[field_hits] - prev_stats[field_hits]
-                        misses = stats[field_misses] - prev_stats[field_misses]
-                        total = hits + misses
-                        if total > 0:
-                            val = 100.0 * hits / total
-                        else:
-                            val = 0
-                        self.setGraphVal('memcached_hitpct',  field_name, 
-                                         round(val,  2))
-                        
+        self.saveState(dict((k, stats[k]) for k in stateKeys 
+                            if k in stats))
+        getStat = stats.get
+        setGraphVal = self.setGraphVal
+        graphHasField = self.graphHasField
+        
+        def statSum(keys):
+            """Return sum of stats for keys or None if any stat is missing."""
+            total = 0
+            for k in keys:
+                val = getStat(k)
+                if val is None:
+                    return None
+                total += val
+            return total
+        
+        for graph_name in self.getGraphList():
+            field_stats = fetchSpecs.get(graph_name)
+            if field_stats is not None:
+                for (fname, fstats) in field_stats:
+                    if graphHasField(graph_name, fname):
+                        setGraphVal(graph_name, fname, statSum(fstats))
+        prev_stats = self._prev_stats
+        if self.hasGraph('memcached_hitpct') and prev_stats:
+            for (field_name,  field_hits,  field_misses) in hitpctFields:
+                try:
+                    hits = stats[field_hits] - prev_stats[field_hits]
+                    misses = stats[field_misses] - prev_stats[field_misses]
+                except KeyError:
+                    continue
+                total = hits + misses
+                if total > 0:
+                    val = 100.0 * hits / total
+                else:
+                    val = 0
+                setGraphVal('memcached_hitpct',  field_name, round(val,  2))
+
     def autoconf(self):
         """Implements Munin Plugin Auto-Configuration Option.
         
         @return: True if plugin can be  auto-configured, False otherwise.
                  
         """
-        serverInfo = MemcachedInfo(self._host,  self._port, self._socket_file)
+        serverInfo = self._getServerInfo(self._host, self._port, 
+                                         self._socket_file)
         return (serverInfo is not None)
+    
+    def _getStats(self):
+        """Query Memcached for stats once per plugin run and return the 
+        cached result on subsequent calls.
+        
+        @return: Dictionary of stats.
+        
+        """
+        if self._stats is None:
+            serverInfo = self._getServerInfo(self._host, self._port, 
+                                             self._socket_file)
+            self._stats = serverInfo.getStats()
+        return self._stats
+    
+    @classmethod
+    def _getServerInfo(cls, host, port, socket_file):
+        """Return connected MemcachedInfo instance for server, reusing the 
+        connection already established for the same server if available.
+        
+        @param host:        Memcached Host for TCP connections.
+        @param port:        Memcached Port for TCP connections.
+        @param socket_file: Memcached Socket File Path for UNIX Socket connections.
+        @return:            MemcachedInfo instance.
+        
+        """
+        key = (host, port, socket_file)
+        serverInfo = cls._serverCache.get(key)
+        if serverInfo is None:
+            serverInfo = MemcachedInfo(host, port, socket_file)
+            cls._serverCache[key] = serverInfo
+        return serverInfo
+    
+    @classmethod
+    def _closeServerInfo(cls):
+        """Close all cached connections to Memcached."""
+        for serverInfo in cls._serverCache.values():
+            serverInfo.close()
+        cls._serverCache.clear()
+
+
+atexit.register(MuninMemcachedPlugin._closeServerInfo)
 
 
 def main():
@@ -6,6 +6,7 @@ The statistics are obtained by connecting to and querying the Memcached.
 
 import re
 import os
+import socket
 import util
 
 __author__ = "Ali Onur Uyar"
@@ -60,8 +61,13 @@ class MemcachedInfo:
     
     def __del__(self):
         """Cleanup."""
+        self.close()
+    
+    def close(self):
+        """Close connection to Memcached."""
         if self._conn is not None:
             self._conn.close()
+            self._conn = None
 
     def _connect(self):
         """Connect to Memcached."""
@@ -75,6 +81,9 @@ class MemcachedInfo:
                                          timeout)
             else:
                 self._conn = util.Telnet(self._host, self._port, self._socketFile)
+            if self._socketFile is None:
+                self._conn.sock.setsockopt(socket.IPPROTO_TCP, 
+                                           socket.TCP_NODELAY, 1)
         except:     
             raise Exception("Connection to %s failed." % self._instanceName)
             
@@ -85,20 +94,47 @@ class MemcachedInfo:
         @return:    Array of strings.
         
         """
+        return self._sendStatCmds((cmd,))[0]
+    
+    def _sendStatCmds(self, cmds):
+        """Send multiple stat commands to Memcached Server in a single write 
+        and return response lines for each command.
+        
+        @param cmds: List of command strings.
+        @return:     List of arrays of strings; one array per command.
+        
+        """
+        regex = re.compile('^(END|ERROR|(?:CLIENT|SERVER)_ERROR.*?)\r\n', 
+                           re.MULTILINE)
+        responses = []
+        if self._conn is None:
+            self._connect()
         try:
-            self._conn.write("%s\r\n" % cmd)
-            regex = re.compile('^(END|ERROR)\r\n', re.MULTILINE)
-            (idx, mobj, text) = self._conn.expect([regex,], self._timeout) #@UnusedVariable
+            self._conn.write("".join(["%s\r\n" % cmd for cmd in cmds]))
         except:
+            self.close()
             raise Exception("Communication with %s failed" % self._instanceName)
-        if mobj is not None:
-            if mobj.group(1) == 'END':
-                return text.splitlines()[:-1]
-            elif mobj.group(1) == 'ERROR':
-                raise Exception("Protocol error in communication with %s."
+        for cmd in cmds: #@UnusedVariable
+            try:
+                (idx, mobj, text) = self._conn.expect([regex,], self._timeout) #@UnusedVariable
+            except:
+                self.close()
+                raise Exception("Communication with %s failed" 
                                 % self._instanceName)
-        else:
-            raise Exception("Connection with %s timed out." % self._instanceName)
+            if mobj is None:
+                self.close()
+                raise Exception("Connection with %s timed out." 
+                                % self._instanceName)
+            elif mobj.group(1) == 'END':
+                responses.append(text.splitlines()[:-1])
+            else:
+                # Replies to the remaining pipelined commands are still 
+                # pending; drop the connection to keep it in step.
+                self.close()
+                raise Exception("Protocol error in communication with %s: %s"
+                                % (self._instanceName, mobj.group(1)))
+        return responses
+    
     def _parseStats(self, lines, parse_slabs = False):
         """Parse stats output from memcached and return dictionary of stats-
         
@@ -110,15 +146,17 @@ class MemcachedInfo:
         info_dict = {}
         info_dict['slabs'] = {}
         for line in lines:
-            mobj = re.match('^STAT\s(\w+)\s(\S+)$',  line)
-            if mobj:
-                info_dict[mobj.group(1)] = util.parse_value(mobj.group(2), True)
+            cols = line.split()
+            if len(cols) != 3 or cols[0] != 'STAT':
                 continue
+            (key, val) = cols[1:]
+            if ':' not in key:
+                info_dict[key] = util.parse_value(val, True)
             elif parse_slabs:
-                mobj = re.match('STAT\s(\w+:)?(\d+):(\w+)\s(\S+)$',  line)
-                if mobj:
-                    (slab, key, val) = mobj.groups()[-3:]      
-                    if not info_dict['slabs'].has_key(slab):
+                keys = key.split(':')
+                if len(keys) <= 3 and keys[-2].isdigit():
+                    (slab, key) = keys[-2:]
+                    if slab not in info_dict['slabs']:
                         info_dict['slabs'][slab] = {}
                     info_dict['slabs'][slab][key] = util.parse_value(val, True)
         return info_dict
@@ -132,6 +170,18 @@ class MemcachedInfo:
         lines = self._sendStatCmd('stats')
         return self._parseStats(lines, False)
     
+    def getStatsBatch(self, cmds):
+        """Query Memcached with multiple stat commands pipelined in a single 
+        request and return stats for each command.
+        
+        @param cmds: List of stat command strings.
+                     (Example: 'stats', 'stats items', 'stats slabs')
+        @return:     List of stats dictionaries; one per command.
+        
+        """
+        return [self._parseStats(lines, cmd in ('stats items', 'stats slabs'))
+                for (cmd, lines) in zip(cmds, self._sendStatCmds(cmds))]
+    
     def getStatsItems(self):
         """Query Memcached and return stats on items broken down by slab.
         